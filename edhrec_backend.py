@@ -1,10 +1,24 @@
+import asyncio
+import atexit
+import functools
+import gzip
+import heapq
+import io
 import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from operator import itemgetter
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
+import sqlite3
+import threading
 from datetime import datetime
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import aiohttp
 from tqdm import tqdm
 import argparse
 
@@ -14,6 +28,296 @@ try:
 except Exception:
     TK_AVAILABLE = False
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except Exception:
+    ORJSON_AVAILABLE = False
+
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except Exception:
+    IJSON_AVAILABLE = False
+
+# Public API, also what `from edhrec_backend import *` re-exports
+__all__ = [
+    "CARD_TYPES",
+    "EDHRecAnalyzer",
+    "ScryfallCache",
+    "TokenBucket",
+    "json_dumps",
+    "json_loads",
+    "parse_inputs",
+    "format_commander_name",
+    "fetch_edhrec_build_id",
+    "clean_output_directories",
+    "fetch_deck_table",
+    "filter_deck_hashes",
+    "fetch_deck_hashes",
+    "fetch_decks_with_progress",
+    "fetch_decks_parallel",
+    "count_cards",
+    "group_cards_by_type",
+    "save_master_cardcount",
+    "save_cardtypes",
+    "save_decklists",
+    "main",
+]
+
+
+################
+# JSON Helpers
+################
+
+def json_loads(data):
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_dumps(obj) -> bytes:
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+####################
+# Name Formatting
+####################
+
+_NON_ALNUM_RE = re.compile(r"[^\w\s]")
+_SPACE_TO_DASH = str.maketrans({" ": "-", "'": ""})
+
+_BUILD_ID_RE = re.compile(rb'/_next/static/([^/"]+)/_buildManifest\.js')
+
+
+######################
+# Card Type Buckets
+######################
+
+# Priority order: a card with several types goes in the first one listed
+CARD_TYPES = ("Creature", "Instant", "Sorcery", "Artifact", "Enchantment", "Planeswalker", "Battle", "Land")
+_TYPE_PRIORITY = {t: i for i, t in enumerate(CARD_TYPES)}
+_TYPE_RE = re.compile(r"\b(?:" + "|".join(CARD_TYPES) + r")\b")
+
+# Output files are written in one go through a 1MB buffer
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Max ids per "WHERE ... IN (?, ...)" query (older SQLite builds cap at 999)
+SQLITE_IN_CHUNK = 500
+
+
+#################
+# Rate Limiting
+#################
+
+class TokenBucket:
+    """
+    Token bucket limiter: refills `rate` tokens per second and saves up
+    to `capacity` of them while idle, so short bursts go out immediately
+    while the average rate is still respected.
+
+    An empty bucket hands out a future token and the caller sleeps until
+    it is due, so the lock is never held while sleeping. The same bucket
+    works for threads (acquire) and coroutines (acquire_async).
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes a token and returns how many seconds until it is due:
+        0.0 when one was available, so the caller need not sleep at all.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+########################
+# Scryfall Cache Store
+########################
+
+class ScryfallCache:
+    """
+    Card metadata cache ({name: {"type_line", "image_url", "scryfall_uri"}})
+    backed by one SQLite table.
+
+    Rows are read into memory on first use and written back by flush(),
+    which also records when each card was last used and trims the table
+    to the `max_entries` most recently used cards, so the cache stays
+    bounded no matter how many commanders have been run. Memory keeps
+    the `memory_entries` most recently used rows.
+    """
+
+    def __init__(self, path: str, max_entries: int = 50000, memory_entries: int = 20000):
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS card_types ("
+            "name TEXT PRIMARY KEY, type_line TEXT, image_url TEXT, scryfall_uri TEXT, last_used INTEGER)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS card_types_last_used ON card_types (last_used)")
+        self.db.commit()
+
+        self._entries = OrderedDict()   # rows loaded (or added) this session
+        self._missing = set()           # names known not to be in the table
+        self._dirty = set()             # new or changed entries
+        self._used = set()              # entries read since the last flush
+
+    @staticmethod
+    def _row_to_meta(row):
+        return {"type_line": row[0], "image_url": row[1], "scryfall_uri": row[2]}
+
+    def is_empty(self):
+        with self._lock:
+            return self.db.execute("SELECT 1 FROM card_types LIMIT 1").fetchone() is None
+
+    def prefetch(self, names):
+        """
+        Loads every row for `names` with a few batched queries, so later
+        get() calls are served from memory.
+        """
+        with self._lock:
+            todo = [n for n in dict.fromkeys(names) if n not in self._entries and n not in self._missing]
+        for i in range(0, len(todo), SQLITE_IN_CHUNK):
+            chunk = todo[i:i + SQLITE_IN_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self.db.execute(
+                    f"SELECT name, type_line, image_url, scryfall_uri FROM card_types WHERE name IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for row in rows:
+                    self._entries[row[0]] = self._row_to_meta(row[1:])
+                self._missing.update(n for n in chunk if n not in self._entries)
+
+    def _load(self, name):
+        # caller holds _lock; fills _entries/_missing but doesn't count as a use
+        meta = self._entries.get(name)
+        if meta is None and name not in self._missing:
+            row = self.db.execute(
+                "SELECT type_line, image_url, scryfall_uri FROM card_types WHERE name = ?", (name,)
+            ).fetchone()
+            if row is None:
+                self._missing.add(name)
+            else:
+                meta = self._entries[name] = self._row_to_meta(row)
+        return meta
+
+    def get(self, name, default=None):
+        with self._lock:
+            meta = self._load(name)
+            if meta is None:
+                return default
+            self._entries.move_to_end(name)   # memory keeps the most recently used
+            self._used.add(name)
+            return meta
+
+    def __contains__(self, name):
+        # a membership check isn't a use, so it doesn't refresh last_used
+        with self._lock:
+            return self._load(name) is not None
+
+    def __getitem__(self, name):
+        meta = self.get(name)
+        if meta is None:
+            raise KeyError(name)
+        return meta
+
+    def _set(self, name, meta):
+        # caller holds _lock
+        self._entries[name] = meta
+        self._missing.discard(name)
+        self._dirty.add(name)
+        self._used.add(name)
+
+    def __setitem__(self, name, meta):
+        with self._lock:
+            self._set(name, meta)
+
+    def update(self, metas):
+        with self._lock:
+            for name, meta in metas.items():
+                self._set(name, meta)
+
+    def _count_stored(self, names):
+        # caller holds _lock; how many of `names` already have a row
+        stored = 0
+        for i in range(0, len(names), SQLITE_IN_CHUNK):
+            chunk = names[i:i + SQLITE_IN_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            stored += self.db.execute(
+                f"SELECT COUNT(*) FROM card_types WHERE name IN ({placeholders})", chunk
+            ).fetchone()[0]
+        return stored
+
+    @property
+    def dirty(self):
+        with self._lock:
+            return bool(self._dirty or self._used)
+
+    def flush(self):
+        # The analyzer is shared between web sessions, so the sets are copied
+        # under the lock and only the names written are cleared
+        now = int(time.time())
+        with self._lock:
+            # Used rows are written in full too, not just given a new
+            # last_used: one may have been trimmed from the table (by this
+            # or another process) while it was still held in memory
+            names = self._dirty | self._used
+            rows = [
+                (name, meta.get("type_line", "Unknown"), meta.get("image_url"), meta.get("scryfall_uri"), now)
+                for name, meta in ((n, self._entries.get(n)) for n in names)
+                if meta is not None
+            ]
+
+            # only rows for new names can take the table over max_entries
+            grew = len(rows) > self._count_stored([row[0] for row in rows])
+
+            self.db.executemany("INSERT OR REPLACE INTO card_types VALUES (?, ?, ?, ?, ?)", rows)
+
+            if grew:
+                count = self.db.execute("SELECT COUNT(*) FROM card_types").fetchone()[0]
+                if count > self.max_entries:
+                    self.db.execute(
+                        "DELETE FROM card_types WHERE name NOT IN "
+                        "(SELECT name FROM card_types ORDER BY last_used DESC LIMIT ?)",
+                        (self.max_entries,),
+                    )
+            self.db.commit()
+
+            self._dirty.difference_update(names)
+            self._used.difference_update(names)
+            self._missing.clear()
+            while len(self._entries) > self.memory_entries:
+                self._entries.popitem(last=False)
+
 
 ########################
 # EDHRec Analyzer Class
@@ -21,97 +325,267 @@ except Exception:
 
 class EDHRecAnalyzer:
     def __init__(self):
-        # Rate limiting
-        self.last_scryfall_request = 0
-        self.last_edhrec_request = 0
+        # Rate limiting (average delay between requests + idle burst size)
         self.SCRYFALL_MIN_DELAY = 0.12   # Scryfall: 50–100ms requested
         self.EDHREC_MIN_DELAY = 0.80     # EDHREC safe delay
+        self.SCRYFALL_BURST = 10
+        self.EDHREC_BURST = 5
+        self.scry_bucket = TokenBucket(1 / self.SCRYFALL_MIN_DELAY, self.SCRYFALL_BURST)
+        self.edh_bucket = TokenBucket(1 / self.EDHREC_MIN_DELAY, self.EDHREC_BURST)
+
+        # Async fetching (requests in flight per host). The buckets pace how
+        # often requests are sent; these only bound how many can be waiting
+        # on a slow response at once.
+        self.EDHREC_CONCURRENCY = 20
+        self.SCRYFALL_CONCURRENCY = 8
+        self.SCRYFALL_COLLECTION_SIZE = 75   # max identifiers per /cards/collection
+        self.MAX_DECK_BYTES = 5 * 1024 * 1024   # a decklist page is tens of KB
+
+        # HTTP sessions (one pooled keep-alive session per host)
+        self.HTTP_TIMEOUT = 10
+        self.HTTP_RETRIES = 3
+        self.HTTP_BACKOFF = 0.5
+        self.RETRY_STATUSES = (429, 500, 502, 503, 504)
+        self.HTTP_HEADERS = {
+            "User-Agent": "edhrec-deck-tools/1.0",
+            "Accept": "application/json;q=0.9,*/*;q=0.8",
+            "Accept-Encoding": "gzip, deflate",
+        }
+        self.edh_session = self._build_session()
+        self.scry_session = self._build_session()
 
-        # Build ID cache
+        # Build ID cache (saved between runs, re-checked after BUILD_ID_TTL)
         self.build_id = None
+        self.build_id_checked_at = 0.0   # time.time() the build ID was last confirmed
+        self.build_id_saved = False      # loaded from the last run, not re-checked
+        self.build_id_stale = False      # a build ID that may be out of date got a 404
+        self.BUILD_ID_CHUNK_BYTES = 16 * 1024
+        self.BUILD_ID_TTL = 6 * 60 * 60
+        self.BUILD_ID_RECHECK = 10 * 60  # younger IDs only 404 for decks that are gone
 
         # Cache paths
         self.cache_root = "./cache"
-        self.deck_cache_dir = os.path.join(self.cache_root, "deck_cache")
-        self.scryfall_cache_path = os.path.join(self.cache_root, "scryfall_cache.json")
+        self.deck_cache_dir = os.path.join(self.cache_root, "deck_cache")   # legacy per-deck files
+        self.deck_db_path = os.path.join(self.cache_root, "deck_cache.sqlite")
+        self.build_id_path = os.path.join(self.cache_root, "edhrec_build.json")
+        self.scryfall_cache_path = os.path.join(self.cache_root, "scryfall_cache.sqlite")
+        self.legacy_scryfall_cache_paths = [
+            os.path.join(self.cache_root, "scryfall_cache.json.gz"),
+            os.path.join(self.cache_root, "scryfall_cache.json"),
+        ]
 
         os.makedirs(self.cache_root, exist_ok=True)
-        os.makedirs(self.deck_cache_dir, exist_ok=True)
 
-        # Scryfall cache
-        self.scryfall_cache = self.load_scryfall_cache()
+        # Worker threads for blocking work started from async code and for
+        # the build ID + deck table pair. Each job is one short request or
+        # one SQLite commit (serialized by the DB lock anyway), so 2 is
+        # enough; threads are only started on first use.
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="edhrec-io")
+        atexit.register(self._executor.shutdown, wait=False)
+
+        # Deck cache (single SQLite file, shared by fetch threads)
+        self._deck_db_lock = threading.Lock()
+        self.deck_db = self.open_deck_cache()
+
+        # Scryfall cache (opened on first use, flushed once per batch)
+        self._scryfall_cache = None
 
     #################
-    # Rate limiting
+    # HTTP Sessions
     #################
 
-    def rate_limit_scryfall(self):
-        elapsed = time.time() - self.last_scryfall_request
-        if elapsed < self.SCRYFALL_MIN_DELAY:
-            time.sleep(self.SCRYFALL_MIN_DELAY - elapsed)
-        self.last_scryfall_request = time.time()
-
-    def rate_limit_edhrec(self):
-        elapsed = time.time() - self.last_edhrec_request
-        if elapsed < self.EDHREC_MIN_DELAY:
-            time.sleep(self.EDHREC_MIN_DELAY - elapsed)
-        self.last_edhrec_request = time.time()
+    def _build_session(self):
+        retries = Retry(
+            total=self.HTTP_RETRIES,
+            backoff_factor=self.HTTP_BACKOFF,
+            status_forcelist=self.RETRY_STATUSES,
+            raise_on_status=False,   # hand back the last response, callers check status_code
+        )
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retries)
+
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.headers.update(self.HTTP_HEADERS)
+        return session
+
+    def _client_session(self):
+        timeout = aiohttp.ClientTimeout(
+            total=None, sock_connect=self.HTTP_TIMEOUT, sock_read=self.HTTP_TIMEOUT
+        )
+        return aiohttp.ClientSession(headers=self.HTTP_HEADERS, timeout=timeout)
+
+    async def _send_with_retries(self, bucket, request, read):
+        """
+        Async counterpart of the sessions' Retry policy: sends request()
+        through the rate limiter, retrying connection errors and
+        RETRY_STATUSES with exponential backoff.
+        Returns (status, await read(response)), or (status, None) if not 200.
+        """
+        for attempt in range(self.HTTP_RETRIES + 1):
+            last_try = attempt == self.HTTP_RETRIES
+            await bucket.acquire_async()
+            try:
+                async with request() as r:
+                    if r.status not in self.RETRY_STATUSES or last_try:
+                        return r.status, (await read(r) if r.status == 200 else None)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if last_try:
+                    raise
+            await asyncio.sleep(self.HTTP_BACKOFF * 2 ** attempt)
 
     #################
     # Format Helpers
     #################
 
     @staticmethod
+    @functools.lru_cache(maxsize=256)
     def format_commander_name(commander_name: str):
-        non_alphas_regex = r"[^\w\s]"
-        formatted_name = re.sub(non_alphas_regex, "", commander_name)
-        formatted_name = formatted_name.lower()
-        formatted_name = formatted_name.replace(" ", "-")
-        formatted_name = formatted_name.replace("'", "")
-        return formatted_name
+        return _NON_ALNUM_RE.sub("", commander_name).lower().translate(_SPACE_TO_DASH)
+
+    ################################
+    # Conditional GET (ETag) Cache #
+    ################################
+
+    def load_http_cache(self, url: str):
+        with self._deck_db_lock:
+            row = self.deck_db.execute(
+                "SELECT etag, last_modified, body FROM http_cache WHERE url = ?", (url,)
+            ).fetchone()
+        if not row:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "body": gzip.decompress(row[2])}
+
+    def save_http_cache(self, url: str, response, body: bytes):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+
+        with self._deck_db_lock:
+            self.deck_db.execute(
+                "INSERT OR REPLACE INTO http_cache (url, etag, last_modified, body) VALUES (?, ?, ?, ?)",
+                (url, etag, last_modified, gzip.compress(body, compresslevel=6)),
+            )
+            self.deck_db.commit()
+
+    @staticmethod
+    def conditional_headers(cached):
+        headers = {}
+        if cached:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
 
     ###########################
     # Build Manifest Fetching #
     ###########################
 
-    def fetch_edhrec_build_id(self):
+    def load_saved_build_id(self):
         """
-        Fetches the EDHREC build ID by parsing the homepage HTML and extracting:
-        /_next/static/<BUILD_ID>/_buildManifest.js
+        Returns (build_id, ts) saved by a run within BUILD_ID_TTL, or None.
         """
-        if self.build_id:
-            return self.build_id
+        try:
+            with open(self.build_id_path, "rb") as f:
+                saved = json_loads(f.read())
+        except (OSError, ValueError):
+            return None
 
-        self.rate_limit_edhrec()
-        r = requests.get("https://edhrec.com")
-        if r.status_code != 200:
-            raise Exception("Failed to load EDHREC homepage to detect build ID")
+        ts = saved.get("ts", 0)
+        if not saved.get("build_id") or time.time() - ts > self.BUILD_ID_TTL:
+            return None
+        return saved["build_id"], ts
 
-        html = r.text
+    def save_build_id(self, build_id: str):
+        tmp = self.build_id_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(json_dumps({"build_id": build_id, "ts": time.time()}))
+        os.replace(tmp, self.build_id_path)
 
-        marker = "_buildManifest.js"
-        idx = html.find(marker)
-        if idx == -1:
-            raise Exception("Could not find _buildManifest.js reference in homepage.")
+    def fetch_edhrec_build_id(self, refresh: bool = False):
+        """
+        Fetches the EDHREC build ID by parsing the homepage HTML and extracting:
+        /_next/static/<BUILD_ID>/_buildManifest.js
 
-        prefix = html[:idx]
+        A build ID confirmed (or saved by a run) within BUILD_ID_TTL is
+        reused without a request unless refresh is set.
+        """
+        if not refresh:
+            if self.build_id and time.time() - self.build_id_checked_at <= self.BUILD_ID_TTL:
+                return self.build_id
+
+            saved = self.load_saved_build_id()
+            if saved:
+                self.build_id, self.build_id_checked_at = saved
+                self.build_id_saved = True
+                self.build_id_stale = False
+                print(f"[INFO] Using saved EDHREC build ID: {self.build_id}")
+                return self.build_id
+
+        # Only the extracted build ID is kept for the homepage, not the HTML
+        url = "https://edhrec.com"
+        cached = self.load_http_cache(url)
+
+        self.edh_bucket.acquire()
+        with self.edh_session.get(
+            url, stream=True, headers=self.conditional_headers(cached), timeout=self.HTTP_TIMEOUT
+        ) as r:
+            if r.status_code == 304 and cached:
+                build_id = cached["body"].decode("utf-8")
+                self.set_verified_build_id(build_id)
+                print(f"[INFO] EDHREC build ID unchanged: {build_id}")
+                return build_id
+
+            if r.status_code != 200:
+                raise Exception("Failed to load EDHREC homepage to detect build ID")
+
+            # The manifest is referenced by the script preloads in <head>, so
+            # stop reading at the first match. The last few hundred bytes of
+            # each chunk are kept in case the path is split across two.
+            match = None
+            window = b""
+            for chunk in r.iter_content(chunk_size=self.BUILD_ID_CHUNK_BYTES):
+                window = window[-256:] + chunk
+                match = _BUILD_ID_RE.search(window)
+                if match:
+                    break
 
-        static_marker = "/_next/static/"
-        static_idx = prefix.rfind(static_marker)
-        if static_idx == -1:
-            raise Exception("Could not locate /_next/static/ in homepage.")
+        if not match:
+            raise Exception("Could not find /_next/static/<BUILD_ID>/_buildManifest.js in homepage.")
 
-        start = static_idx + len(static_marker)
-        end = prefix.find("/", start)
-        build_id = prefix[start:end]
+        build_id = match.group(1).decode("utf-8", "replace")
 
         if not build_id or len(build_id) < 5:
             raise Exception(f"Extracted invalid EDHREC build ID: '{build_id}'")
 
-        self.build_id = build_id
+        self.set_verified_build_id(build_id)
+        self.save_http_cache(url, r, build_id.encode("utf-8"))
         print(f"[INFO] EDHREC build ID detected: {build_id}")
         return build_id
 
+    def set_verified_build_id(self, build_id: str):
+        self.build_id = build_id
+        self.build_id_checked_at = time.time()
+        self.build_id_saved = False
+        self.build_id_stale = False
+        self.save_build_id(build_id)
+
+    def build_id_may_be_stale(self):
+        """
+        True if a 404 could mean EDHREC has deployed since the build ID was
+        confirmed: it came from a saved file or was checked a while ago.
+        """
+        return self.build_id_saved or time.time() - self.build_id_checked_at > self.BUILD_ID_RECHECK
+
+    def refresh_build_id(self):
+        """
+        Re-checks the homepage after decks 404ed with a build ID that may
+        be out of date.
+        """
+        print("[INFO] EDHREC build ID looks stale, re-checking")
+        return self.fetch_edhrec_build_id(refresh=True)
+
     ##########################
     # Output Directory Cleanup
     ##########################
@@ -120,11 +594,15 @@ class EDHRecAnalyzer:
         output_dir = os.path.join("./output", formatted_name, "edhrec-decklists")
 
         if os.path.exists(output_dir):
-            for f in os.listdir(output_dir):
-                try:
-                    os.remove(os.path.join(output_dir, f))
-                except Exception:
-                    pass
+            with os.scandir(output_dir) as entries:
+                for entry in entries:
+                    # is_file() uses the type scandir already read, no extra stat
+                    if not entry.is_file():
+                        continue
+                    try:
+                        os.unlink(entry.path)
+                    except OSError:
+                        pass
         else:
             os.makedirs(output_dir, exist_ok=True)
 
@@ -135,16 +613,51 @@ class EDHRecAnalyzer:
     # EDHREC Deck Table Functions
     ##############################
 
-    def fetch_deck_table(self, commander_formatted: str):
+    def fetch_deck_table_body(self, commander_formatted: str):
+        """
+        Returns the raw JSON bytes of the commander's deck table.
+        """
         url = f"https://json.edhrec.com/pages/decks/{commander_formatted}.json"
+        cached = self.load_http_cache(url)
 
-        self.rate_limit_edhrec()
-        r = requests.get(url)
+        self.edh_bucket.acquire()
+        r = self.edh_session.get(url, headers=self.conditional_headers(cached), timeout=self.HTTP_TIMEOUT)
+
+        if r.status_code == 304 and cached:
+            return cached["body"]
 
         if r.status_code != 200:
             raise Exception(f"Failed to fetch deck table: HTTP {r.status_code}")
 
-        return r.json()
+        self.save_http_cache(url, r, r.content)
+        return r.content
+
+    def fetch_deck_table(self, commander_formatted: str):
+        return json_loads(self.fetch_deck_table_body(commander_formatted))
+
+    def fetch_deck_hashes(self, commander_formatted: str, recent: int, min_price: float, max_price: float):
+        """
+        fetch_deck_table + filter_deck_hashes without building the whole
+        table: with ijson installed the entries are parsed one at a time
+        and only the `recent` best matches are kept.
+        """
+        body = self.fetch_deck_table_body(commander_formatted)
+        if IJSON_AVAILABLE:
+            entries = ijson.items(io.BytesIO(body), "table.item", use_float=True)
+        else:
+            entries = json_loads(body)["table"]
+        return self.select_deck_hashes(entries, recent, min_price, max_price)
+
+    def fetch_build_id_and_deck_hashes(self, commander_formatted: str, recent: int, min_price: float, max_price: float):
+        """
+        Fetches the build ID and the filtered deck hashes at the same time;
+        they are independent requests and share the pooled EDHREC session.
+        """
+        build_id = self._executor.submit(self.fetch_edhrec_build_id)
+        deck_hashes = self._executor.submit(
+            self.fetch_deck_hashes, commander_formatted, recent, min_price, max_price
+        )
+        return build_id.result(), deck_hashes.result()
 
     ###################################
     # Deck Filtering (price + recency)
@@ -152,165 +665,485 @@ class EDHRecAnalyzer:
 
     @staticmethod
     def filter_deck_hashes(deck_table: dict, recent: int, min_price: float, max_price: float):
-        entries = deck_table["table"]
-
-        for e in entries:
-            e["savedate_dt"] = datetime.strptime(e["savedate"], "%Y-%m-%d")
-
-        sorted_entries = sorted(entries, key=lambda e: e["savedate_dt"], reverse=True)
+        return EDHRecAnalyzer.select_deck_hashes(deck_table["table"], recent, min_price, max_price)
 
-        filtered = [
-            e for e in sorted_entries
-            if min_price <= e["price"] <= max_price
-        ]
-
-        limited = filtered[:recent]
+    @staticmethod
+    def select_deck_hashes(entries, recent: int, min_price: float, max_price: float):
+        """
+        Returns the urlhash of the `recent` newest entries priced within
+        [min_price, max_price]. `entries` may be any iterable, including a
+        streaming parser.
+        """
+        # savedate is ISO "YYYY-MM-DD", which sorts the same as the date itself
+        limited = heapq.nlargest(
+            recent,
+            (e for e in entries if min_price <= e["price"] <= max_price),
+            key=itemgetter("savedate"),
+        )
         return [e["urlhash"] for e in limited]
 
     ##################################
     # Persistent Deck Cache Functions
     ##################################
 
+    def open_deck_cache(self):
+        db = sqlite3.connect(self.deck_db_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS decks (id TEXT PRIMARY KEY, json BLOB)")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS http_cache "
+            "(url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB)"
+        )
+        db.commit()
+        return db
+
     def load_deck_from_cache(self, deck_id):
-        path = os.path.join(self.deck_cache_dir, deck_id + ".json")
-        if os.path.exists(path):
+        with self._deck_db_lock:
+            row = self.deck_db.execute("SELECT json FROM decks WHERE id = ?", (deck_id,)).fetchone()
+
+        if row:
             try:
-                with open(path, "r") as f:
-                    return json.load(f)
-            except Exception:
+                return self.decode_deck(row[0])
+            except (ValueError, OSError):
                 return None
-        return None
 
-    def save_deck_to_cache(self, deck_id, deck):
+        return self.load_legacy_deck(deck_id)
+
+    def load_legacy_deck(self, deck_id):
+        """
+        Reads a deck saved by the old one-file-per-deck cache and moves it
+        into the SQLite cache.
+        """
         path = os.path.join(self.deck_cache_dir, deck_id + ".json")
-        with open(path, "w") as f:
-            json.dump(deck, f, indent=2)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, "rb") as f:
+                deck = json_loads(f.read())
+        except Exception:
+            return None
+
+        self.save_deck_to_cache(deck_id, deck)
+        return deck
+
+    def bulk_load(self, deck_ids):
+        """
+        Returns {deck_id: deck} for every id already in the cache, using a
+        few batched queries instead of one per deck.
+        """
+        deck_ids = list(deck_ids)
+        if not deck_ids:
+            return {}
+
+        rows = []
+        with self._deck_db_lock:
+            for i in range(0, len(deck_ids), SQLITE_IN_CHUNK):
+                chunk = deck_ids[i:i + SQLITE_IN_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows += self.deck_db.execute(
+                    f"SELECT id, json FROM decks WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+
+        decks = {}
+        for deck_id, blob in rows:
+            try:
+                decks[deck_id] = self.decode_deck(blob)
+            except (ValueError, OSError):
+                continue
+
+        if not os.path.isdir(self.deck_cache_dir):
+            return decks
+
+        for deck_id in deck_ids:
+            if deck_id not in decks:
+                deck = self.load_legacy_deck(deck_id)
+                if deck:
+                    decks[deck_id] = deck
+
+        return decks
+
+    def save_deck_to_cache(self, deck_id, deck):
+        blob = gzip.compress(json_dumps(deck), compresslevel=6)
+        with self._deck_db_lock:
+            self.deck_db.execute(
+                "INSERT OR REPLACE INTO decks (id, json) VALUES (?, ?)",
+                (deck_id, blob),
+            )
+            self.deck_db.commit()
+
+    @staticmethod
+    def decode_deck(blob):
+        # rows written before compression was added are plain JSON
+        if blob[:2] == b"\x1f\x8b":
+            blob = gzip.decompress(blob)
+        return json_loads(blob)
 
     ###############################
     # EDHREC Deck Fetching (API)
     ###############################
 
     def fetch_deck_by_hash(self, deck_id: str):
-        cached = self.load_deck_from_cache(deck_id)
-        if cached:
-            return cached
-
-        if not self.build_id:
-            self.fetch_edhrec_build_id()
+        decks = self.fetch_decks_parallel([deck_id])
+        return decks[0] if decks else None
 
-        self.rate_limit_edhrec()
+    async def _fetch_deck_by_hash(self, session, sem, deck_id: str):
         url = f"https://edhrec.com/_next/data/{self.build_id}/deckpreview/{deck_id}.json?deckId={deck_id}"
-        r = requests.get(url)
 
-        if r.status_code != 200:
-            print(f"Failed to fetch deck {deck_id} - HTTP {r.status_code}")
+        async with sem:
+            # the rest of the batch is retried once the build ID is re-checked
+            if self.build_id_stale:
+                return None
+
+            try:
+                status, body = await self._send_with_retries(
+                    self.edh_bucket,
+                    lambda: session.get(url),
+                    lambda r: self._read_capped(r, self.MAX_DECK_BYTES),
+                )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Error fetching deck {deck_id}: {e}")
+                return None
+
+        if status == 404 and self.build_id_may_be_stale():
+            self.build_id_stale = True
+            return None
+        if status != 200:
+            print(f"Failed to fetch deck {deck_id} - HTTP {status}")
+            return None
+        if body is None:
+            print(f"Deck {deck_id} is larger than {self.MAX_DECK_BYTES} bytes, skipping")
             return None
 
         try:
-            deck = r.json()["pageProps"]["data"]["deck"]
-        except KeyError:
+            deck = json_loads(body)["pageProps"]["data"]["deck"]
+        except (ValueError, KeyError, TypeError):
             print(f"Deck JSON format unexpected for {deck_id}")
             return None
 
-        self.save_deck_to_cache(deck_id, deck)
+        # gzip + SQLite commit stays off the event loop
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.save_deck_to_cache, deck_id, deck)
         return deck
 
+    @staticmethod
+    async def _read_capped(response, max_bytes: int):
+        """
+        Reads the response body, or returns None once it grows past max_bytes.
+        """
+        if response.content_length and response.content_length > max_bytes:
+            return None
+
+        chunks = []
+        size = 0
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            size += len(chunk)
+            if size > max_bytes:
+                return None
+            chunks.append(chunk)
+        return b"".join(chunks)
+
     #########################################
-    # Parallel Deck Downloader (Rate-Aware)
+    # Async Deck Downloader (Rate-Aware)
     #########################################
 
+    async def _fetch_all(self, deck_hashes):
+        sem = asyncio.Semaphore(self.EDHREC_CONCURRENCY)
+        async with self._client_session() as session:
+            tasks = [self._fetch_deck_by_hash(session, sem, deck_id) for deck_id in deck_hashes]
+            return await asyncio.gather(*tasks)
+
+    async def _iter_decks(self, deck_hashes):
+        """
+        Async generator yielding (deck_id, deck) in completion order.
+        """
+        sem = asyncio.Semaphore(self.EDHREC_CONCURRENCY)
+
+        async def fetch(session, deck_id):
+            return deck_id, await self._fetch_deck_by_hash(session, sem, deck_id)
+
+        async with self._client_session() as session:
+            tasks = [asyncio.ensure_future(fetch(session, deck_id)) for deck_id in deck_hashes]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield await next_done
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    def partition_cached(self, deck_hashes):
+        """
+        Dedupes deck_hashes and splits them into ({deck_id: deck} already
+        cached, [deck_id] still to fetch), keeping the original order.
+        """
+        unique = list(dict.fromkeys(deck_hashes))
+        cached = self.bulk_load(unique)
+        misses = [deck_id for deck_id in unique if deck_id not in cached]
+        print(f"[INFO] Deck cache hits: {len(cached)}/{len(unique)}")
+        return cached, misses
+
+    def fetch_decks_parallel(self, deck_hashes):
+        """
+        Fetches all decks concurrently and returns the ones that succeeded.
+        """
+        if not deck_hashes:
+            return []
+
+        cached, misses = self.partition_cached(deck_hashes)
+
+        if misses:
+            self.fetch_edhrec_build_id()   # no request while the ID is fresh
+            fetched = dict(zip(misses, asyncio.run(self._fetch_all(misses))))
+
+            failed = [deck_id for deck_id in misses if not fetched[deck_id]]
+            if failed and self.build_id_stale:
+                self.refresh_build_id()
+                fetched.update(zip(failed, asyncio.run(self._fetch_all(failed))))
+
+            cached.update(fetched)
+
+        decks = [cached.get(deck_id) for deck_id in dict.fromkeys(deck_hashes)]
+        return [deck for deck in decks if deck]
+
     def fetch_decks_with_progress(self, deck_hashes):
         """
         Generator that yields (completed, total, deck)
         Safe for Streamlit progress bars.
         """
-        total = len(deck_hashes)
-        completed = 0
-
         if not deck_hashes:
             return
 
-        max_workers = min(5, len(deck_hashes))
+        cached, misses = self.partition_cached(deck_hashes)
+        total = len(cached) + len(misses)
+        completed = 0
+
+        for deck in cached.values():
+            completed += 1
+            yield completed, total, deck
 
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {
-                executor.submit(self.fetch_deck_by_hash, deck_id): deck_id
-                for deck_id in deck_hashes
-            }
+        if not misses:
+            return
 
-            for future in as_completed(futures):
-                deck = None
-                try:
-                    deck = future.result()
-                except Exception as e:
-                    print(f"Error fetching deck {futures[future]}: {e}")
+        self.fetch_edhrec_build_id()   # no request while the ID is fresh
 
+        retry = []
+        for deck_id, deck in self._stream_decks(misses):
+            if deck is None and self.build_id_stale:
+                retry.append(deck_id)
+                continue
+            completed += 1
+            yield completed, total, deck
+
+        if retry:
+            self.refresh_build_id()
+            for _, deck in self._stream_decks(retry):
                 completed += 1
                 yield completed, total, deck
 
+    def _stream_decks(self, deck_hashes):
+        # Drive the async generator one deck at a time so callers stay synchronous
+        loop = asyncio.new_event_loop()
+        decks = self._iter_decks(deck_hashes)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(decks.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(decks.aclose())
+            loop.close()
+
 
     ####################
     # Scryfall Caching
     ####################
 
+    @property
+    def scryfall_cache(self):
+        if self._scryfall_cache is None:
+            self._scryfall_cache = self.load_scryfall_cache()
+        return self._scryfall_cache
+
     def load_scryfall_cache(self):
-        if os.path.exists(self.scryfall_cache_path):
+        cache = ScryfallCache(self.scryfall_cache_path)
+        if cache.is_empty():
+            cache.update(self.load_legacy_scryfall_cache())
+            cache.flush()
+        return cache
+
+    def load_legacy_scryfall_cache(self):
+        """
+        Reads the JSON Scryfall cache written by older versions. Entries in
+        the original string-only format are skipped; they are re-fetched
+        with full metadata on next use.
+        """
+        for path in self.legacy_scryfall_cache_paths:
+            if not os.path.exists(path):
+                continue
+            opener = gzip.open if path.endswith(".gz") else open
             try:
-                with open(self.scryfall_cache_path, "r") as f:
-                    return json.load(f)
+                with opener(path, "rb") as f:
+                    legacy = json_loads(f.read())
             except Exception:
-                return {}
+                continue
+            return {name: meta for name, meta in legacy.items() if isinstance(meta, dict)}
         return {}
 
     def save_scryfall_cache(self):
-        with open(self.scryfall_cache_path, "w") as f:
-            json.dump(self.scryfall_cache, f, indent=2)
+        self.scryfall_cache.flush()
+
+    def flush_scryfall_cache(self):
+        if self._scryfall_cache is not None and self._scryfall_cache.dirty:
+            self.save_scryfall_cache()
 
     def get_card_type(self, card_name: str):
         cached = self.scryfall_cache.get(card_name)
-
-        # -------------------------------
-        # NEW: handle old cache format
-        # -------------------------------
-        if isinstance(cached, dict):
+        if cached:
             return cached["type_line"]
 
-        # Old cache format (string only)
-        if isinstance(cached, str):
-            # Upgrade cache entry
-            meta = self._fetch_scryfall_metadata(card_name)
-            self.scryfall_cache[card_name] = meta
-            self.save_scryfall_cache()
-            return meta["type_line"]
-
-        # Not cached at all
         meta = self._fetch_scryfall_metadata(card_name)
+        if meta is None:
+            return "Unknown"   # not cached, so a later call asks again
         self.scryfall_cache[card_name] = meta
-        self.save_scryfall_cache()
         return meta["type_line"]
 
+    @staticmethod
+    def unknown_card_metadata():
+        return {"type_line": "Unknown", "image_url": None, "scryfall_uri": None}
+
     def _fetch_scryfall_metadata(self, card_name: str):
-        self.rate_limit_scryfall()
+        """
+        Returns the card's metadata, unknown_card_metadata() if Scryfall has
+        no such card, or None if the request failed and shouldn't be cached.
+        """
+        self.scry_bucket.acquire()
 
-        url = f"https://api.scryfall.com/cards/named?exact={card_name}"
-        r = requests.get(url)
+        url = "https://api.scryfall.com/cards/named"
+        try:
+            r = self.scry_session.get(url, params={"exact": card_name}, timeout=self.HTTP_TIMEOUT)
+        except requests.RequestException as e:
+            print(f"Error fetching Scryfall data for {card_name}: {e}")
+            return None
 
+        if r.status_code == 404:
+            return self.unknown_card_metadata()
         if r.status_code != 200:
-            return {
-                "type_line": "Unknown",
-                "image_url": None,
-                "scryfall_uri": None,
-            }
+            print(f"Failed to fetch Scryfall data for {card_name} - HTTP {r.status_code}")
+            return None
+
+        return self._extract_card_metadata(json_loads(r.content))
+
+    @staticmethod
+    def _extract_card_metadata(card: dict):
+        image_url = None
 
-        card = r.json()
+        # normal single-face images
+        if isinstance(card.get("image_uris"), dict):
+            image_url = card["image_uris"].get("normal")
+
+        # double-faced / split / transform cards
+        if not image_url and isinstance(card.get("card_faces"), list) and card["card_faces"]:
+            face0 = card["card_faces"][0]
+            if isinstance(face0.get("image_uris"), dict):
+                image_url = face0["image_uris"].get("normal")
 
         return {
             "type_line": card.get("type_line", "Unknown"),
-            "image_url": card.get("image_uris", {}).get("normal"),
+            "image_url": image_url,
             "scryfall_uri": card.get("scryfall_uri"),
         }
 
+    async def _fetch_card_types(self, session, sem, names):
+        async def fetch_chunk(chunk):
+            payload = json_dumps({"identifiers": [{"name": name} for name in chunk]})
+
+            async with sem:
+                try:
+                    status, body = await self._send_with_retries(
+                        self.scry_bucket,
+                        lambda: session.post(
+                            "https://api.scryfall.com/cards/collection",
+                            data=payload,
+                            headers={"Content-Type": "application/json"},
+                        ),
+                        lambda r: r.read(),
+                    )
+                    data = json_loads(body) if status == 200 else None
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                    data = None
+
+            if data is None:
+                # not cached, get_card_type will retry these one by one
+                return {}
+
+            # Scryfall returns full names ("Front // Back"), EDHREC may use the front face
+            requested = {name.lower(): name for name in chunk}
+            metas = {}
+            for card in data.get("data", []):
+                names_on_card = [card.get("name", "")]
+                names_on_card += [face.get("name", "") for face in card.get("card_faces") or []]
+                for card_name in names_on_card:
+                    name = requested.get(card_name.lower())
+                    if name:
+                        metas[name] = self._extract_card_metadata(card)
+                        break
+
+            # no such card on Scryfall, cache it so it isn't asked for again
+            for identifier in data.get("not_found", []):
+                name = requested.get(identifier.get("name", "").lower())
+                if name and name not in metas:
+                    metas[name] = self.unknown_card_metadata()
+            return metas
+
+        size = self.SCRYFALL_COLLECTION_SIZE
+        chunks = [names[i:i + size] for i in range(0, len(names), size)]
+
+        metas = {}
+        for result in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks)):
+            metas.update(result)
+        return metas
+
+    async def _fetch_all_card_types(self, names):
+        sem = asyncio.Semaphore(self.SCRYFALL_CONCURRENCY)
+        async with self._client_session() as session:
+            return await self._fetch_card_types(session, sem, names)
+
+    def prefetch_card_types(self, card_names):
+        """
+        Fills the Scryfall cache for every card that isn't cached yet,
+        75 cards per /cards/collection request.
+        Returns True if any cards were fetched and added to the cache.
+        """
+        card_names = list(card_names)
+        self.scryfall_cache.prefetch(card_names)
+
+        missing = [name for name in card_names if name not in self.scryfall_cache]
+        if not missing:
+            return False
 
+        fetched = asyncio.run(self._fetch_all_card_types(missing))
+        self.scryfall_cache.update(fetched)
+        return bool(fetched)
+
+    def get_card_types_bulk(self, card_names):
+        """
+        Returns {card: type_line} for every card. Uncached cards are looked
+        up in batches first, so only the ones a batch failed to resolve
+        fall back to a request each. The cache is saved once at the end.
+        """
+        card_names = list(card_names)
+        self.prefetch_card_types(card_names)
+
+        cache_get = self.scryfall_cache.get
+        types = {}
+        for name in card_names:
+            meta = cache_get(name)
+            types[name] = meta["type_line"] if meta else self.get_card_type(name)
+        self.flush_scryfall_cache()
+        return types
 
     # ✅ NEW: minimal add-on for images + link
     def get_card_metadata(self, card_name: str):
@@ -321,53 +1154,21 @@ class EDHRecAnalyzer:
             "image_url": str|None,
             "scryfall_uri": str|None
           }
-
-        Backward compatible with existing cache:
-          - if cache contains a string, it will be treated as type_line.
-          - we may upgrade to dict once we fetch metadata.
-        """
-        if card_name in self.scryfall_cache:
-            cached = self.scryfall_cache[card_name]
-            if isinstance(cached, dict):
-                return {
-                    "type_line": cached.get("type_line", "Unknown"),
-                    "image_url": cached.get("image_url"),
-                    "scryfall_uri": cached.get("scryfall_uri"),
-                }
-            # cached is the old string type_line
+        """
+        cached = self.scryfall_cache.get(card_name)
+        if cached:
             return {
-                "type_line": cached,
-                "image_url": None,
-                "scryfall_uri": None,
+                "type_line": cached.get("type_line", "Unknown"),
+                "image_url": cached.get("image_url"),
+                "scryfall_uri": cached.get("scryfall_uri"),
             }
 
-        self.rate_limit_scryfall()
-        url = f"https://api.scryfall.com/cards/named?exact={card_name}"
-        r = requests.get(url)
-
-        if r.status_code != 200:
-            meta = {"type_line": "Unknown", "image_url": None, "scryfall_uri": None}
-        else:
-            card = r.json()
-            type_line = card.get("type_line", "Unknown")
-            image_url = None
-            scryfall_uri = card.get("scryfall_uri")
-
-            # normal single-face images
-            if isinstance(card.get("image_uris"), dict):
-                image_url = card["image_uris"].get("normal")
-
-            # double-faced / split / transform cards
-            if not image_url and isinstance(card.get("card_faces"), list) and card["card_faces"]:
-                face0 = card["card_faces"][0]
-                if isinstance(face0.get("image_uris"), dict):
-                    image_url = face0["image_uris"].get("normal")
-
-            meta = {"type_line": type_line, "image_url": image_url, "scryfall_uri": scryfall_uri}
+        meta = self._fetch_scryfall_metadata(card_name)
+        if meta is None:
+            return self.unknown_card_metadata()   # not cached, so a later call asks again
 
-        # store dict format (upgrade path)
+        # saved with the next flush_scryfall_cache(), not on every card
         self.scryfall_cache[card_name] = meta
-        self.save_scryfall_cache()
         return meta
 
     ###################################
@@ -376,45 +1177,51 @@ class EDHRecAnalyzer:
 
     @staticmethod
     def count_cards(all_decks):
+        """
+        Returns {card: count} ordered by count, highest first. Everything
+        built from it (type groups, output files) keeps that order, so the
+        cards are only sorted once.
+        """
         card_counts = {}
+        get = card_counts.get   # a plain dict with a bound get is faster than Counter here
 
-        for deck in all_decks:
-            for line in deck:
-                try:
-                    qty_str, card_name = line.split(" ", 1)
-                    qty = int(qty_str)
-                except ValueError:
-                    continue
+        for line in chain.from_iterable(all_decks):
+            qty_str, sep, card_name = line.partition(" ")
+            if not sep:
+                continue
+            try:
+                qty = int(qty_str)
+            except ValueError:
+                continue
 
-                card_counts[card_name] = card_counts.get(card_name, 0) + qty
+            card_counts[card_name] = get(card_name, 0) + qty
 
-        return card_counts
+        return dict(sorted(card_counts.items(), key=itemgetter(1), reverse=True))
 
-    def group_cards_by_type(self, card_counts):
-        type_groups = {
-            "Creature": {},
-            "Instant": {},
-            "Sorcery": {},
-            "Artifact": {},
-            "Enchantment": {},
-            "Planeswalker": {},
-            "Battle": {},
-            "Land": {},
-            "Unknown": {}
-        }
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)   # many cards share a type line
+    def classify_type_line(type_line: str):
+        """
+        Returns the CARD_TYPES bucket for a Scryfall type line, or "Unknown".
+        "Artifact Creature — Golem" is a Creature, "Artifact Land" an Artifact.
+        """
+        matches = _TYPE_RE.findall(type_line)
+        if not matches:
+            return "Unknown"
+        if len(matches) == 1:
+            return matches[0]
+        # leftmost match isn't the bucket ("Artifact Creature"), priority is
+        return min(matches, key=_TYPE_PRIORITY.__getitem__)
 
-        for card, count in tqdm(card_counts.items(), desc="Classifying card types"):
-            type_line = self.get_card_type(card)
+    def group_cards_by_type(self, card_counts):
+        type_groups = {t: {} for t in CARD_TYPES}
+        type_groups["Unknown"] = {}
 
-            matched = False
-            for t in type_groups:
-                if t != "Unknown" and t in type_line:
-                    type_groups[t][card] = count
-                    matched = True
-                    break
+        # all network lookups happen here, the loop below is in-memory only
+        type_lines = self.get_card_types_bulk(card_counts.keys())
 
-            if not matched:
-                type_groups["Unknown"][card] = count
+        for card, count in tqdm(card_counts.items(), desc="Classifying card types"):
+            type_groups[self.classify_type_line(type_lines[card])][card] = count
 
         return type_groups
 
@@ -444,42 +1251,44 @@ class EDHRecAnalyzer:
     # Saving Output (Master list + type lists)
     ###########################################
 
-    @staticmethod
-    def save_master_cardcount(card_counts, output_directory, metadata_header=""):
-        sorted_cards = sorted(card_counts.items(), key=lambda x: x[1], reverse=True)
+    # Both writers expect the count-ordered dicts from count_cards /
+    # group_cards_by_type and write them in that order without re-sorting.
 
-        with open(os.path.join(output_directory, "master_card_counts.txt"), "w") as f:
+    @staticmethod
+    def write_card_counts(path, card_counts, metadata_header=""):
+        with open(path, "w", buffering=WRITE_BUFFER_SIZE) as f:
             if metadata_header:
                 f.write(metadata_header + "\n")
-            for card, count in sorted_cards:
-                f.write(f"{count}  {card}\n")
+            f.writelines(f"{count}  {card}\n" for card, count in card_counts.items())
 
-    @staticmethod
-    def save_cardtypes(type_groups, output_directory, metadata_header=""):
+    @classmethod
+    def save_master_cardcount(cls, card_counts, output_directory, metadata_header=""):
+        path = os.path.join(output_directory, "master_card_counts.txt")
+        cls.write_card_counts(path, card_counts, metadata_header)
+
+    @classmethod
+    def save_cardtypes(cls, type_groups, output_directory, metadata_header=""):
         for type_name, cards in type_groups.items():
             if not cards:
                 continue
 
             filename = f"cards_{type_name.lower()}.txt"
-            path = os.path.join(output_directory, filename)
-
-            sorted_cards = sorted(cards.items(), key=lambda x: x[1], reverse=True)
-
-            with open(path, "w") as f:
-                if metadata_header:
-                    f.write(metadata_header + "\n")
-                for card, count in sorted_cards:
-                    f.write(f"{count}  {card}\n")
+            cls.write_card_counts(os.path.join(output_directory, filename), cards, metadata_header)
 
     @staticmethod
     def save_decklists(all_decks, output_directory, formatted_name, metadata_header=""):
         decklist_path = os.path.join(output_directory, formatted_name + "-decklists.txt")
-        with open(decklist_path, "w") as f:
+
+        def lines():
             if metadata_header:
-                f.write(metadata_header + "\n")
+                yield metadata_header + "\n"
             for d in all_decks:
-                f.write("\n".join(d))
-                f.write("\n\n")
+                for line in d:
+                    yield line + "\n"
+                yield "\n"
+
+        with open(decklist_path, "w", buffering=WRITE_BUFFER_SIZE) as f:
+            f.writelines(lines())
         return decklist_path
 
 
@@ -544,40 +1353,53 @@ def parse_inputs():
 # Module-level convenience #
 ############################
 
-_analyzer = EDHRecAnalyzer()
+# Created on first use, so importing the module stays cheap
+_analyzer = None
+
+def _get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = EDHRecAnalyzer()
+    return _analyzer
 
 def format_commander_name(commander_name: str):
-    return _analyzer.format_commander_name(commander_name)
+    return _get_analyzer().format_commander_name(commander_name)
 
 def fetch_edhrec_build_id():
-    return _analyzer.fetch_edhrec_build_id()
+    return _get_analyzer().fetch_edhrec_build_id()
 
 def clean_output_directories(formatted_name: str):
-    return _analyzer.clean_output_directories(formatted_name)
+    return _get_analyzer().clean_output_directories(formatted_name)
 
 def fetch_deck_table(commander_formatted: str):
-    return _analyzer.fetch_deck_table(commander_formatted)
+    return _get_analyzer().fetch_deck_table(commander_formatted)
 
 def filter_deck_hashes(deck_table: dict, recent: int, min_price: float, max_price: float):
-    return _analyzer.filter_deck_hashes(deck_table, recent, min_price, max_price)
+    return _get_analyzer().filter_deck_hashes(deck_table, recent, min_price, max_price)
+
+def fetch_deck_hashes(commander_formatted: str, recent: int, min_price: float, max_price: float):
+    return _get_analyzer().fetch_deck_hashes(commander_formatted, recent, min_price, max_price)
 
 def fetch_decks_with_progress(deck_hashes):
-    return _analyzer.fetch_decks_with_progress(deck_hashes)
+    return _get_analyzer().fetch_decks_with_progress(deck_hashes)
+
+def fetch_decks_parallel(deck_hashes):
+    return _get_analyzer().fetch_decks_parallel(deck_hashes)
 
 def count_cards(all_decks):
-    return _analyzer.count_cards(all_decks)
+    return _get_analyzer().count_cards(all_decks)
 
 def group_cards_by_type(card_counts):
-    return _analyzer.group_cards_by_type(card_counts)
+    return _get_analyzer().group_cards_by_type(card_counts)
 
 def save_master_cardcount(card_counts, output_directory, metadata_header=""):
-    return _analyzer.save_master_cardcount(card_counts, output_directory, metadata_header)
+    return _get_analyzer().save_master_cardcount(card_counts, output_directory, metadata_header)
 
 def save_cardtypes(type_groups, output_directory, metadata_header=""):
-    return _analyzer.save_cardtypes(type_groups, output_directory, metadata_header)
+    return _get_analyzer().save_cardtypes(type_groups, output_directory, metadata_header)
 
 def save_decklists(all_decks, output_directory, formatted_name, metadata_header=""):
-    return _analyzer.save_decklists(all_decks, output_directory, formatted_name, metadata_header)
+    return _get_analyzer().save_decklists(all_decks, output_directory, formatted_name, metadata_header)
 
 
 ########
@@ -593,18 +1415,28 @@ def main():
         root = None
 
     commander_name, recent, min_price, max_price, source_info = parse_inputs()
+    analyzer = _get_analyzer()
 
-    formatted_name = _analyzer.format_commander_name(commander_name)
-    output_directory = _analyzer.clean_output_directories(formatted_name)
+    formatted_name = analyzer.format_commander_name(commander_name)
+    output_directory = analyzer.clean_output_directories(formatted_name)
 
-    _analyzer.fetch_edhrec_build_id()
-    deck_table = _analyzer.fetch_deck_table(formatted_name)
-
-    deck_hashes = _analyzer.filter_deck_hashes(deck_table, recent, min_price, max_price)
+    _, deck_hashes = analyzer.fetch_build_id_and_deck_hashes(formatted_name, recent, min_price, max_price)
     print(f"Using {len(deck_hashes)} deck hashes")
 
-    # NOTE: CLI path in your original code referenced fetch_decks_parallel() which isn't defined.
-    # Left untouched as requested.
+    all_decks = analyzer.fetch_decks_parallel(deck_hashes)
+    print(f"Downloaded {len(all_decks)}/{len(deck_hashes)} decks")
+
+    metadata_header = analyzer.build_metadata_header(
+        commander_name, recent, min_price, max_price, source_info
+    )
+    analyzer.save_decklists(all_decks, output_directory, formatted_name, metadata_header)
+
+    card_counts = analyzer.count_cards(all_decks)
+    analyzer.save_master_cardcount(card_counts, output_directory, metadata_header)
+
+    type_groups = analyzer.group_cards_by_type(card_counts)
+    analyzer.save_cardtypes(type_groups, output_directory, metadata_header)
+    print(f"Results saved to {output_directory}")
 
     if root:
         root.destroy()
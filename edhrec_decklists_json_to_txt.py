@@ -0,0 +1,12 @@
+"""
+EDHREC decklist aggregator (command line entry point).
+
+All fetching, caching and output code lives in edhrec_backend, which the
+web app uses as well; this script only runs its CLI so the two can't
+drift apart.
+"""
+from edhrec_backend import *  # noqa: F401,F403
+from edhrec_backend import main
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,10 @@ import re
 import random
 import math
 
+non_alphas_regex = re.compile(r"[^\w\s]") # Everything that's not alphanumeric or space
+
 def format_commander_name(commander_name:str):
-    non_alphas_regex = r"[^\w\s]" # Everything that's not alphanumeric or space
-    formatted_name = re.sub(non_alphas_regex, "", commander_name)
+    formatted_name = non_alphas_regex.sub("", commander_name)
     formatted_name = formatted_name.lower() # Make lowercase
     formatted_name = formatted_name.replace(" ", "-")  # Replace spaces with hyphens
     print(f"In format_commander_name and formatted name is {formatted_name}")
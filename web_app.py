@@ -1,14 +1,161 @@
 import os
 import io
+import html
+import hashlib
 import zipfile
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 
 import streamlit as st
 import pandas as pd
 import altair as alt
 
-from edhrec_backend import EDHRecAnalyzer
+from edhrec_backend import CARD_TYPES, EDHRecAnalyzer, json_dumps, json_loads
 
-analyzer = EDHRecAnalyzer()
+# Every output bucket, in the order the card type files are written
+TYPE_GROUP_NAMES = CARD_TYPES + ("Unknown",)
+
+
+###################################
+# Cached Backend Calls
+###################################
+
+@st.cache_resource
+def get_analyzer():
+    # One analyzer per server process: its HTTP sessions, SQLite caches and
+    # build ID survive reruns and are shared between browser sessions.
+    return EDHRecAnalyzer()
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_deck_hashes(formatted_name, recent, min_price, max_price):
+    return get_analyzer().fetch_deck_hashes(formatted_name, recent, min_price, max_price)
+
+
+class CardMetadataUnavailable(Exception):
+    pass
+
+
+@st.cache_data(max_entries=50_000, show_spinner=False)
+def cached_card_metadata(card_name):
+    analyzer = get_analyzer()
+    meta = analyzer.get_card_metadata(card_name)
+    # A failed lookup isn't in the Scryfall cache; raising keeps it out of
+    # this memo too, so the card is asked for again on a later rerun
+    if card_name not in analyzer.scryfall_cache:
+        raise CardMetadataUnavailable(card_name)
+    return meta
+
+
+def card_metadata(card_name):
+    try:
+        return cached_card_metadata(card_name)
+    except CardMetadataUnavailable:
+        return EDHRecAnalyzer.unknown_card_metadata()
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def read_output(path, mtime_ns):
+    # mtime_ns is only part of the cache key, so a rewritten file is re-read
+    with open(path, "rb", buffering=1 << 16) as f:
+        return f.read()
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def list_outputs(output_dir, mtime_ns):
+    # a directory's mtime changes whenever a file is added to or removed from it
+    with os.scandir(output_dir) as entries:
+        return sorted(entry.name for entry in entries if entry.is_file())
+
+
+def list_output_files(output_dir):
+    return list_outputs(output_dir, os.stat(output_dir).st_mtime_ns)
+
+
+def read_output_file(output_dir, filename):
+    path = os.path.join(output_dir, filename)
+    return read_output(path, os.stat(path).st_mtime_ns)
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def build_zip_bytes(output_dir, file_stamps):
+    # file_stamps is ((filename, mtime_ns), ...) so a new run rebuilds the zip
+    # text still shrinks several-fold at the fastest deflate level; anything else is stored as-is
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as zipf:
+        for fn, _ in file_stamps:
+            if fn.endswith(".txt"):
+                compress_type, compresslevel = zipfile.ZIP_DEFLATED, 1
+            else:
+                compress_type, compresslevel = zipfile.ZIP_STORED, None
+            zipf.write(
+                os.path.join(output_dir, fn),
+                arcname=fn,
+                compress_type=compress_type,
+                compresslevel=compresslevel,
+            )
+    return zip_buffer.getvalue()
+
+
+###################################
+# Run Snapshots
+###################################
+
+def output_stamps(output_dir):
+    with os.scandir(output_dir) as entries:
+        return tuple(sorted(
+            (entry.name, entry.stat().st_mtime_ns) for entry in entries if entry.is_file()
+        ))
+
+
+def output_unchanged(output_dir, stamps):
+    # the output directory is shared per commander, so any other run (web
+    # or CLI) for it rewrites these files and changes their stamps
+    try:
+        return stamps is not None and output_stamps(output_dir) == tuple(map(tuple, stamps))
+    except (OSError, TypeError):
+        return False
+
+
+def run_snapshot_path(formatted_name):
+    return os.path.join(get_analyzer().cache_root, "web_runs", formatted_name + ".json")
+
+
+def save_run_snapshot(formatted_name, run_key, output_dir, files, card_counts, type_groups):
+    # files is output_stamps(output_dir) taken after the run wrote its output
+    path = run_snapshot_path(formatted_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    snapshot = {
+        "run_key": run_key,
+        "output_dir": output_dir,
+        "files": files,
+        "card_counts": card_counts,
+        "type_groups": type_groups,
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(json_dumps(snapshot))
+    os.replace(tmp, path)
+
+
+def load_run_snapshot(formatted_name, run_key):
+    """
+    Returns the saved results of an earlier identical run, or None if the
+    output files have been rewritten since.
+    """
+    try:
+        with open(run_snapshot_path(formatted_name), "rb") as f:
+            snapshot = json_loads(f.read())
+        if snapshot.get("run_key") != run_key:
+            return None
+        if not output_unchanged(snapshot["output_dir"], snapshot["files"]):
+            return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return snapshot
+
+
+analyzer = get_analyzer()
 
 ###################################
 # Streamlit UI Setup
@@ -93,6 +240,8 @@ defaults = {
     "card_counts": None,
     "type_groups": None,
     "final_status": None,
+    "run_key": None,
+    "output_stamps": None,
 }
 
 for key, value in defaults.items():
@@ -102,20 +251,22 @@ for key, value in defaults.items():
 # Inputs
 ###################################
 
-st.header("Commander Selection")
+# A form only reruns the script on submit, not on every edit
+with st.form("deck_query"):
+    st.header("Commander Selection")
 
-commander_name = st.text_input(
-    "Commander Name",
-    # value=default_commander,
-    placeholder="e.g. Atraxa, Praetors' Voice"
-)
+    commander_name = st.text_input(
+        "Commander Name",
+        # value=default_commander,
+        placeholder="e.g. Atraxa, Praetors' Voice"
+    )
 
-st.header("Deck Query Filters")
-recent = st.number_input("How many recent decks to fetch?", 5, 200, 20, 5)
-min_price = st.number_input("Minimum deck price", 5, 10000, 5, 5)
-max_price = st.number_input("Maximum deck price", 5, 10000, 100, 5)
+    st.header("Deck Query Filters")
+    recent = st.number_input("How many recent decks to fetch?", 5, 200, 20, 5)
+    min_price = st.number_input("Minimum deck price", 5, 10000, 5, 5)
+    max_price = st.number_input("Maximum deck price", 5, 10000, 100, 5)
 
-run_button = st.button("Fetch & Analyze Decklists")
+    run_button = st.form_submit_button("Fetch & Analyze Decklists")
 
 if not st.session_state.results_ready and not run_button:
     st.info("Ready when you are — enter your commander and press the button!")
@@ -128,6 +279,7 @@ final_status_box = st.empty()
 ###################################
 
 if run_button:
+    previous_results_ready = st.session_state.results_ready
     st.session_state.results_ready = False
 
     if not commander_name.strip():
@@ -147,9 +299,22 @@ if run_button:
     )
 
     try:
-        # Step 1 — Build ID
-        active_step.info("🔄 Detecting EDHREC build ID…")
-        build_id = analyzer.fetch_edhrec_build_id()
+        # Steps 1 & 2 — Build ID and Deck Table (independent requests, fetched together)
+        active_step.info("🔄 Detecting EDHREC build ID and fetching deck table…")
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            build_id_future = executor.submit(analyzer.fetch_edhrec_build_id)
+
+            try:
+                deck_hashes = cached_deck_hashes(
+                    formatted_name,
+                    int(recent),
+                    float(min_price),
+                    float(max_price),
+                )
+            except Exception:
+                deck_hashes = None
+
+        build_id = build_id_future.result()
 
         if not formatted_name or "-" not in formatted_name:
             st.warning(
@@ -158,12 +323,7 @@ if run_button:
             )
 
 
-        # Step 2 — Deck Table
-        active_step.info("🔄 Fetching deck table…")
-
-        try:
-            deck_table = analyzer.fetch_deck_table(formatted_name)
-        except Exception:
+        if deck_hashes is None:
             active_step.empty()
             st.error(
                 f"❌ Commander **{commander_name}** was not found on EDHREC.\n\n"
@@ -175,13 +335,6 @@ if run_button:
             )
             st.stop()
 
-
-        deck_hashes = analyzer.filter_deck_hashes(
-            deck_table,
-            int(recent),
-            float(min_price),
-            float(max_price),
-        )
         st.session_state.deck_hashes = deck_hashes
 
         if not deck_hashes:
@@ -196,88 +349,110 @@ if run_button:
             st.stop()
 
 
-        # Step 3 — Download Decklists
-        active_step.info("🔄 Downloading decklists…")
-        progress = st.progress(0)
-        status = st.empty()
-
-        all_decks = []
-        for completed, total, deck in analyzer.fetch_decks_with_progress(deck_hashes):
-            if deck:
-                all_decks.append(deck)
-            progress.progress(completed / total)
-            status.info(f"Downloaded {completed}/{total} decks")
-
-        progress.empty()
-        status.empty()
-
-        st.session_state.all_decks = all_decks
+        # Same query, build and decks as the results on screen (all of which
+        # downloaded), and nothing has rewritten their files since: the output
+        # would come out identical, so skip straight to showing it
+        run_key = hashlib.blake2b(
+            repr((formatted_name, int(recent), float(min_price), float(max_price),
+                  build_id, tuple(deck_hashes))).encode("utf-8"),
+            digest_size=16,
+        ).hexdigest()
+        unchanged = (
+            previous_results_ready
+            and st.session_state.run_key == run_key
+            and len(st.session_state.all_decks or ()) == len(deck_hashes)
+            and output_unchanged(st.session_state.output_dir, st.session_state.output_stamps)
+        )
 
-        # Step 4 — Write Output Files
-        active_step.info("🔄 Writing output files…")
+        # Not on screen, but maybe saved by an earlier session (or before a
+        # page reload): restore it instead of rebuilding the same files
+        snapshot = None if unchanged else load_run_snapshot(formatted_name, run_key)
+        if snapshot:
+            st.session_state.update(
+                output_dir=snapshot["output_dir"],
+                output_stamps=snapshot["files"],
+                all_decks=None,
+                card_counts=snapshot["card_counts"],
+                type_groups=snapshot["type_groups"],
+            )
 
-        output_dir = analyzer.clean_output_directories(formatted_name)
-        st.session_state.output_dir = output_dir
+        if unchanged or snapshot:
+            active_step.empty()
+        else:
+            # Step 3 — Download Decklists
+            active_step.info("🔄 Downloading decklists…")
+            progress = st.progress(0)
+            status = st.empty()
+
+            # Each update is a websocket message, so send at most ~50 of them
+            all_decks = []
+            for completed, total, deck in analyzer.fetch_decks_with_progress(deck_hashes):
+                if deck:
+                    all_decks.append(deck)
+                if completed == total or completed % max(1, total // 50) == 0:
+                    progress.progress(completed / total)
+                    status.info(f"Downloaded {completed}/{total} decks")
+
+            progress.empty()
+            status.empty()
+
+            st.session_state.all_decks = all_decks
+
+            # Step 4 — Write Output Files
+            active_step.info("🔄 Writing output files…")
+
+            output_dir = analyzer.clean_output_directories(formatted_name)
+            st.session_state.output_dir = output_dir
+
+            metadata_header = analyzer.build_metadata_header(
+                commander_name,
+                int(recent),
+                float(min_price),
+                float(max_price),
+                source_info={"streamlit-ui": True},
+            )
 
-        metadata_header = analyzer.build_metadata_header(
-            commander_name,
-            int(recent),
-            float(min_price),
-            float(max_price),
-            source_info={"streamlit-ui": True},
-        )
+            analyzer.save_decklists(all_decks, output_dir, formatted_name, metadata_header)
 
-        analyzer.save_decklists(all_decks, output_dir, formatted_name, metadata_header)
+            # Step 5 — Count Cards
+            active_step.info("🔄 Counting cards…")
+            card_counts = analyzer.count_cards(all_decks)
+            st.session_state.card_counts = card_counts
 
-        # Step 5 — Count Cards
-        active_step.info("🔄 Counting cards…")
-        card_counts = analyzer.count_cards(all_decks)
-        st.session_state.card_counts = card_counts
+            analyzer.save_master_cardcount(card_counts, output_dir, metadata_header)
 
-        analyzer.save_master_cardcount(card_counts, output_dir, metadata_header)
+            # Step 6 — Classify Cards
+            active_step.info("🔄 Classifying cards by type…")
 
-        # Step 6 — Classify Cards
-        active_step.info("🔄 Classifying cards by type…")
-        type_progress = st.progress(0)
-        type_status = st.empty()
+            type_groups = {type_name: {} for type_name in TYPE_GROUP_NAMES}
 
-        type_groups = {
-            "Creature": {},
-            "Instant": {},
-            "Sorcery": {},
-            "Artifact": {},
-            "Enchantment": {},
-            "Planeswalker": {},
-            "Battle": {},
-            "Land": {},
-            "Unknown": {},
-        }
+            # One batched Scryfall lookup, then classify each distinct type line once
+            type_lines = analyzer.get_card_types_bulk(card_counts.keys())
 
-        items = list(card_counts.items())
-        total_cards = len(items)
+            card_df = pd.DataFrame({"card": list(card_counts), "count": list(card_counts.values())})
+            card_df["type_line"] = card_df["card"].map(type_lines)
+            buckets = {tl: analyzer.classify_type_line(tl) for tl in card_df["type_line"].unique()}
+            card_df["bucket"] = card_df["type_line"].map(buckets)
 
-        for idx, (card, count) in enumerate(items, start=1):
-            type_line = analyzer.get_card_type(card)
-            matched = False
+            # groupby keeps row order inside each group, so buckets stay count-ordered
+            for bucket, group in card_df.groupby("bucket", sort=False):
+                type_groups[bucket] = dict(zip(group["card"], group["count"].tolist()))
 
-            for t in type_groups:
-                if t != "Unknown" and t in type_line:
-                    type_groups[t][card] = count
-                    matched = True
-                    break
+            active_step.empty()
 
-            if not matched:
-                type_groups["Unknown"][card] = count
+            st.session_state.type_groups = type_groups
+            analyzer.save_cardtypes(type_groups, output_dir, metadata_header)
 
-            type_progress.progress(idx / total_cards)
-            type_status.info(f"Classified {idx}/{total_cards} cards")
+            st.session_state.output_stamps = output_stamps(output_dir)
 
-        type_progress.empty()
-        type_status.empty()
-        active_step.empty()
+            # only a run that got every deck can stand in for a later one
+            if len(all_decks) == len(deck_hashes):
+                save_run_snapshot(
+                    formatted_name, run_key, output_dir,
+                    st.session_state.output_stamps, card_counts, type_groups,
+                )
 
-        st.session_state.type_groups = type_groups
-        analyzer.save_cardtypes(type_groups, output_dir, metadata_header)
+        st.session_state.run_key = run_key
 
         # Done
         st.session_state.final_status = "success"
@@ -300,7 +475,10 @@ elif st.session_state.final_status == "error":
 # Results (Tabbed UX)
 ###################################
 
-if st.session_state.results_ready:
+# Runs as a fragment: the view radio, sliders and pickers below only rerun
+# this function, not the whole script (inputs, run block, status box).
+@st.fragment
+def render_results():
     output_dir = st.session_state.output_dir
     formatted_name = st.session_state.formatted_name
     card_counts = st.session_state.card_counts
@@ -310,39 +488,20 @@ if st.session_state.results_ready:
         "Plains", "Island", "Swamp", "Mountain", "Forest"
     }
 
-    filtered_card_counts = {
-    card: count
-    for card, count in card_counts.items()
-    if card not in BASIC_LANDS
-    }
-
-    filtered_type_groups = {
-        type_name: {
-            card: count
-            for card, count in cards.items()
-            if card not in BASIC_LANDS
-        }
-        for type_name, cards in type_groups.items()
-    }
-
     show_basics = st.checkbox("Include basic lands", value=False)
 
-    active_card_counts = card_counts if show_basics else filtered_card_counts
-    active_type_groups = type_groups if show_basics else filtered_type_groups
+    def active_items(cards):
+        # (card, count) in count order; basics are skipped as the views read
+        # them, so a rerun only filters the cards it actually shows
+        if show_basics:
+            return iter(cards.items())
+        return ((card, count) for card, count in cards.items() if card not in BASIC_LANDS)
 
 
     # -------------------------------
-    # Prepare files once
+    # List files (contents are read on demand)
     # -------------------------------
-    output_files = sorted(
-        fn for fn in os.listdir(output_dir)
-        if os.path.isfile(os.path.join(output_dir, fn))
-    )
-
-    file_data = {
-        fn: open(os.path.join(output_dir, fn), "rb").read()
-        for fn in output_files
-    }
+    output_files = list_output_files(output_dir)
 
     # -------------------------------
     # Tabs
@@ -360,11 +519,6 @@ if st.session_state.results_ready:
     if active_tab == "📊 Dashboard":
         st.subheader("Card Analysis Dashboard")
 
-        card_df = pd.DataFrame(
-            active_card_counts.items(),
-            columns=["Card", "Count"]
-        ).sort_values("Count", ascending=False)
-
         top_n = st.slider(
             "Show top N cards",
             min_value=5,
@@ -373,11 +527,14 @@ if st.session_state.results_ready:
             key="dashboard_top_n"
         )
 
-        rows = len(card_df.head(top_n))
+        # count_cards returns cards ordered by count, highest first, so the
+        # chart only needs the first top_n of them
+        top = pd.DataFrame(islice(active_items(card_counts), top_n), columns=["Card", "Count"])
+        rows = len(top)
         dynamic_height = min(max(rows * 24, 200), 1200)
 
         chart = (
-            alt.Chart(card_df.head(top_n))
+            alt.Chart(top)
             .mark_bar()
             .encode(
                 x=alt.X("Count:Q", title="Frequency Across Decks"),
@@ -421,39 +578,41 @@ if st.session_state.results_ready:
 
         def cards_for_file(filename):
             if filename == "master_card_counts.txt":
-                return active_card_counts
+                return card_counts
             if filename.startswith("cards_") and filename.endswith(".txt"):
                 type_name = filename.replace("cards_", "").replace(".txt", "").capitalize()
-                return active_type_groups.get(type_name, {})
+                return type_groups.get(type_name, {})
             return None
 
 
         selected_cards = cards_for_file(preview_file)
 
-        if show_images and selected_cards:
-            sorted_cards = sorted(
-                selected_cards.items(),
-                key=lambda x: x[1],
-                reverse=True
-            )[:max_cards]
+        # card_counts and every type group are already ordered by count
+        sorted_cards = list(islice(active_items(selected_cards), max_cards)) if selected_cards else []
 
+        if show_images and sorted_cards:
+
+            # fill every missing card in one /cards/collection batch up front
+            fetched = analyzer.prefetch_card_types(card for card, _ in sorted_cards)
+
+            # One markdown element for the whole list instead of one per card
+            html_parts = []
             for card, count in sorted_cards:
-                meta = analyzer.get_card_metadata(card)
+                meta = card_metadata(card)
                 img = meta.get("image_url")
-                url = meta.get("scryfall_uri") or "#"
+                url = html.escape(meta.get("scryfall_uri") or "#")
+                link = f'<b>{count}×</b> <a href="{url}" target="_blank">{html.escape(card)}</a>'
 
                 if img:
-                    st.markdown(
-                        f"""
-                        <div class="card-hover">
-                            <b>{count}×</b> <a href="{url}" target="_blank">{card}</a>
-                            <img src="{img}" />
-                        </div>
-                        """,
-                        unsafe_allow_html=True
-                    )
+                    html_parts.append(f'<div class="card-hover">{link}<img src="{html.escape(img)}" /></div>')
                 else:
-                    st.markdown(f"**{count}×** [{card}]({url})")
+                    html_parts.append(f'<div class="card-hover">{link}</div>')
+
+            st.markdown("\n".join(html_parts), unsafe_allow_html=True)
+
+            # only save when this rerun actually added cards, not on every rerun
+            if fetched:
+                analyzer.flush_scryfall_cache()
 
         elif preview_file != "(none)":
             st.info("Select a master list or card type file to display images.")
@@ -472,7 +631,7 @@ if st.session_state.results_ready:
 
         if preview_file != "(none)":
             try:
-                st.code(file_data[preview_file].decode("utf-8"), language="text")
+                st.code(read_output_file(output_dir, preview_file).decode("utf-8"), language="text")
             except Exception:
                 st.warning("Cannot display this file as text.")
 
@@ -487,7 +646,7 @@ if st.session_state.results_ready:
         for filename in selected_files:
             st.download_button(
                 label=f"⬇ Download {filename}",
-                data=file_data[filename],
+                data=read_output_file(output_dir, filename),
                 file_name=filename,
                 mime="text/plain"
             )
@@ -498,14 +657,19 @@ if st.session_state.results_ready:
     if active_tab == "📦 Download":
         st.subheader("Download All Outputs")
 
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
-            for fn, data in file_data.items():
-                zipf.writestr(fn, data)
+        file_stamps = tuple(
+            (fn, os.stat(os.path.join(output_dir, fn)).st_mtime_ns)
+            for fn in output_files
+        )
 
+        # the zip is only built once the button is clicked, off the script thread
         st.download_button(
             "📦 Download All as ZIP",
-            zip_buffer.getvalue(),
+            lambda: build_zip_bytes(output_dir, file_stamps),
             f"{formatted_name}_edhrec_output.zip",
             "application/zip",
         )
+
+
+if st.session_state.results_ready:
+    render_results()